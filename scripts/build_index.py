@@ -0,0 +1,127 @@
+import os
+import orjson
+import faiss
+import numpy as np
+import torch
+from sentence_transformers import SentenceTransformer
+from typing import List, Dict, Tuple
+
+CHUNKS_FILE = "vectorstore/kct_chunks.json"
+INDEX_FILE = "vectorstore/kct_index.faiss"
+METADATA_FILE = "vectorstore/kct_metadata.npy"
+CHUNK_BUFFER_FILE = "vectorstore/kct_chunks.bin"
+CHUNK_OFFSETS_FILE = "vectorstore/kct_chunks_offsets.npy"
+
+def load_chunks() -> Tuple[List[str], List[Dict]]:
+    """Load the preprocessed chunks and their metadata"""
+    with open(CHUNKS_FILE, "rb") as f:
+        chunks_data = orjson.loads(f.read())
+    return chunks_data.get("chunks", []), chunks_data.get("metadata", [])
+
+def to_records(metadata: List[Dict]) -> np.ndarray:
+    """Pack per-chunk metadata into a structured array that can be memory-mapped"""
+    # Text is stored as fixed-width UTF-8 bytes, a quarter the size of numpy's UCS-4 strings
+    def text_field(name):
+        return (name, f"S{max((len(m[name].encode('utf-8')) for m in metadata), default=1)}")
+
+    dtype = np.dtype([
+        text_field("url"),
+        text_field("section"),
+        ("content_length", np.int32),
+        text_field("original_content"),
+        ("source_entry", np.int32)
+    ])
+    return np.array(
+        [
+            tuple(m[field].encode("utf-8") if isinstance(m[field], str) else m[field] for field in dtype.names)
+            for m in metadata
+        ],
+        dtype=dtype
+    )
+
+def save_metadata(metadata: List[Dict]):
+    """Write chunk metadata as a structured NumPy array"""
+    np.save(METADATA_FILE, to_records(metadata))
+
+def save_chunk_store(chunks: List[str]):
+    """Write chunk texts as one UTF-8 buffer plus start offsets"""
+    encoded = [chunk.encode("utf-8") for chunk in chunks]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(data) for data in encoded], out=offsets[1:])
+
+    with open(CHUNK_BUFFER_FILE, "wb") as f:
+        f.write(b"".join(encoded))
+    np.save(CHUNK_OFFSETS_FILE, offsets)
+
+def load_model() -> SentenceTransformer:
+    """Load the embedding model, in half precision when a GPU is available"""
+    model = SentenceTransformer("all-MiniLM-L6-v2")
+    if torch.cuda.is_available():
+        model = model.to("cuda").half()
+    return model
+
+def encode_chunks(model: SentenceTransformer, chunks: List[str]) -> np.ndarray:
+    """Encode all chunks in large batches"""
+    embeddings = model.encode(
+        chunks,
+        batch_size=256,
+        show_progress_bar=True,
+        convert_to_numpy=True,
+        normalize_embeddings=True
+    )
+    # FAISS needs C-contiguous float32; this only copies for fp16 output
+    return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+def index_spec(n_vectors: int) -> str:
+    """Pick a FAISS index layout for the corpus size"""
+    # An HNSW graph over fp16 codes is fast and accurate below ~1M vectors;
+    # past that, IVF-PQ keeps memory bounded with 32-byte codes
+    if n_vectors < 1_000_000:
+        return "HNSW32,SQfp16"
+    return "IVF4096,PQ32x8"
+
+def build_index(embeddings: np.ndarray) -> faiss.Index:
+    """Build a sub-linear FAISS index over the chunk embeddings"""
+    # Embeddings are unit length, so inner product is cosine similarity
+    index = faiss.index_factory(
+        embeddings.shape[1],
+        index_spec(len(embeddings)),
+        faiss.METRIC_INNER_PRODUCT
+    )
+    if hasattr(index, "hnsw"):
+        index.hnsw.efConstruction = 200
+    index.train(embeddings)
+    index.add(embeddings)
+    # Search-time parameters are saved with the index
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = 64
+    if hasattr(index, "nprobe"):
+        index.nprobe = 8
+    return index
+
+def create_enhanced_index():
+    """Embed every chunk and write the FAISS index and metadata"""
+    print("🔄 Building KCT vector database...")
+
+    # HNSW construction is parallelized over OpenMP threads
+    faiss.omp_set_num_threads(os.cpu_count() or 4)
+
+    chunks, metadata = load_chunks()
+    if not chunks:
+        print("❌ No chunks found!")
+        return False
+
+    model = load_model()
+    embeddings = encode_chunks(model, chunks)
+
+    index = build_index(embeddings)
+
+    faiss.write_index(index, INDEX_FILE)
+    save_metadata(metadata)
+    save_chunk_store(chunks)
+
+    print(f"✅ Indexed {index.ntotal} chunks")
+    return True
+
+if __name__ == "__main__":
+    create_enhanced_index()
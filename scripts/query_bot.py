@@ -1,102 +1,345 @@
-import json
 import faiss
-import pickle
 import numpy as np
+import torch
 from sentence_transformers import SentenceTransformer
 from groq import Groq
 import os
 from dotenv import load_dotenv
 import re
-from typing import List, Dict
+import functools
+import threading
+import queue
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from collections import OrderedDict
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from typing import List, Dict, Optional, Iterator
 
 # Load API key
 load_dotenv()
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 groq_client = Groq(api_key=GROQ_API_KEY)
 
+# Precompiled query and response cleanup patterns
+_WHITESPACE = re.compile(r'\s+')
+# Multi-line sources blocks, which run until the next blank line
+_SRC_BLOCK_PATTERNS = [
+    re.compile(r'\*\*Sources.*?\*\*.*?(?=\n\n|\Z)', re.DOTALL),
+    re.compile(r'Sources Used:.*?(?=\n\n|\Z)', re.DOTALL)
+]
+# Start of a sources block, for text that arrives a line at a time
+_SRC_BLOCK_START = re.compile(r'\*\*Sources|Sources Used:')
+# Citations contained in a single line
+_SRC_LINE_PATTERNS = [
+    re.compile(r'\[.*?\]\(.*?\)'),  # Markdown links
+    re.compile(r'Source:.*?\n')  # Source lines
+]
+
 # Global variables
 model = None
+query_batcher = None
+kct_bias = None
 index = None
-metadata = []
-chunks = []
+metadata = None
+chunk_buffer = None
+chunk_offsets = None
+
+# How strongly queries that don't mention KCT are pulled towards it
+_KCT_BIAS_WEIGHT = 0.3
+
+# The instructions live only in the system prompt, which stays identical
+# across requests so the provider can reuse its cached prefix
+_SYSTEM_PROMPT = """You are a helpful assistant for Kumaraguru College of Technology (KCT). Follow these rules:
+1. Only use information from the provided sources
+2. Provide a clear, concise answer using the information available
+3. Be conversational and friendly
+4. Use appropriate emojis to make the response engaging
+5. Make your response engaging and informative
+6. Break down information into clear sections
+7. Highlight important points
+8. Do NOT include any source citations, references, or links in your response
+9. If you don't have specific information, provide general helpful guidance"""
+
+# Minimum cosine similarity for a chunk to count as relevant, and the
+# number of such chunks below which search falls back to a plain top k
+_RELEVANCE_THRESHOLD = 0.3
+_MIN_RANGE_HITS = 3
+
+# Roughly 400 tokens of each retrieved chunk go into the prompt
+_MAX_CHUNK_CHARS = 1600
+
+# Answer cache: exact matches on the normalized question, backed by a
+# similarity index over past query embeddings for near-duplicates
+_CACHE_SIZE = 10000
+_CACHE_THRESHOLD = 0.95
+_exact_cache = OrderedDict()
+_cache_index = None
+_cache_answers = []
+_cache_lock = threading.Lock()
+
+_initialized = False
+_init_lock = threading.Lock()
+
+@st.cache_resource(show_spinner=False)
+def get_model():
+    """Load the embedding model once per process"""
+    if torch.cuda.is_available():
+        return SentenceTransformer("all-MiniLM-L6-v2", device="cuda").half()
+    
+    # On CPU, KCT_EMBED_BACKEND=onnx runs the int8-quantized ONNX export
+    # (needs sentence-transformers[onnx]), which uses VNNI int8 GEMMs
+    if os.getenv("KCT_EMBED_BACKEND", "torch") == "onnx":
+        return SentenceTransformer(
+            "all-MiniLM-L6-v2",
+            backend="onnx",
+            model_kwargs={"file_name": "onnx/model_qint8_avx512_vnni.onnx"}
+        )
+    return SentenceTransformer("all-MiniLM-L6-v2")
+
+class QueryBatcher:
+    """Coalesce concurrent query encodes into one model forward pass"""
+    
+    def __init__(self, model: SentenceTransformer, max_wait: float = 0.005, max_batch: int = 32):
+        self.model = model
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        threading.Thread(target=self._run, daemon=True).start()
+    
+    def encode(self, query: str) -> np.ndarray:
+        """Return the normalized embedding of one query"""
+        future = Future()
+        self._queue.put((query, future))
+        return future.result()
+    
+    def _run(self):
+        while True:
+            # Wait for a query, then collect whatever arrives within max_wait
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            try:
+                embeddings = self.model.encode(
+                    [query for query, _ in batch],
+                    batch_size=self.max_batch,
+                    convert_to_numpy=True,
+                    normalize_embeddings=True
+                )
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            
+            for (_, future), embedding in zip(batch, embeddings):
+                future.set_result(embedding)
+
+@st.cache_resource(show_spinner=False)
+def get_query_batcher():
+    """Start the query encoding batcher once per process"""
+    return QueryBatcher(get_model())
+
+@st.cache_resource(show_spinner=False)
+def get_index():
+    """Memory-map the FAISS index once per process"""
+    # Map the index read-only so its pages are loaded on demand and shared
+    # through the page cache; MMAP covers IVF lists, MMAP_IFC (newer FAISS)
+    # covers the flat code storage under HNSW
+    io_flags = faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0) | faiss.IO_FLAG_READ_ONLY
+    index = faiss.read_index("vectorstore/kct_index.faiss", io_flags)
+    # IVF indexes scan nprobe inverted lists per query
+    if hasattr(index, "nprobe"):
+        index.nprobe = 8
+    return index
+
+@st.cache_resource(show_spinner=False)
+def get_metadata():
+    """Memory-map the chunk metadata once per process"""
+    return np.load("vectorstore/kct_metadata.npy", mmap_mode="r")
+
+@st.cache_resource(show_spinner=False)
+def get_chunks():
+    """Memory-map the chunk text buffer and its offsets once per process"""
+    buffer = np.memmap("vectorstore/kct_chunks.bin", dtype=np.uint8, mode="r")
+    offsets = np.load("vectorstore/kct_chunks_offsets.npy", mmap_mode="r")
+    return buffer, offsets
 
 def initialize_system():
     """Initialize the system with proper error handling"""
-    global model, index, metadata, chunks
+    global model, query_batcher, kct_bias, index, metadata, chunk_buffer, chunk_offsets
     
     try:
         print("🔄 Initializing KCT RAG system...")
         
-        # Initialize model
-        model = SentenceTransformer("all-MiniLM-L6-v2")
-        
-        # Load FAISS index
-        if os.path.exists("vectorstore/kct_index.faiss"):
-            print("📚 Loading vector database...")
-            index = faiss.read_index("vectorstore/kct_index.faiss")
-        else:
+        if not os.path.exists("vectorstore/kct_index.faiss"):
             print("❌ Vector database not found!")
             return False
         
-        # Load metadata and chunks
-        if os.path.exists("vectorstore/kct_metadata.pkl"):
-            with open("vectorstore/kct_metadata.pkl", "rb") as f:
-                metadata = pickle.load(f)
+        print("📚 Loading model and vector database...")
+        
+        # The loads are independent and mostly I/O, so run them side by side;
+        # workers share the script context so st.cache_resource sees the session
+        ctx = get_script_run_ctx()
+        with ThreadPoolExecutor(
+            max_workers=4,
+            initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx)
+        ) as executor:
+            model_future = executor.submit(get_model)
+            index_future = executor.submit(get_index)
+            metadata_future = executor.submit(get_metadata) if os.path.exists("vectorstore/kct_metadata.npy") else None
+            chunks_future = executor.submit(get_chunks) if os.path.exists("vectorstore/kct_chunks.bin") else None
+            
+            model = model_future.result()
+            index = index_future.result()
+            if metadata_future is not None:
+                metadata = metadata_future.result()
+            if chunks_future is not None:
+                chunk_buffer, chunk_offsets = chunks_future.result()
         
-        if os.path.exists("vectorstore/kct_chunks.json"):
-            with open("vectorstore/kct_chunks.json", "r", encoding="utf-8") as f:
-                chunks_data = json.load(f)
-                chunks = chunks_data.get("chunks", [])
+        query_batcher = get_query_batcher()
+        kct_bias = np.frombuffer(_encode_query("Kumaraguru College of Technology"), dtype=np.float32)
         
-        print(f"✅ System initialized with {len(chunks)} chunks")
+        print(f"✅ System initialized with {_num_chunks()} chunks")
         return True
         
     except Exception as e:
         print(f"❌ Error initializing system: {e}")
         return False
 
-def enhanced_semantic_search(query: str, k: int = 5) -> List[Dict]:
-    """Enhanced semantic search"""
-    global model, index, chunks, metadata
+def _ensure_init():
+    """Initialize the system once; safe to call from concurrent sessions"""
+    global _initialized
     
-    if model is None or index is None:
-        initialize_system()
+    if _initialized:
+        return
+    with _init_lock:
+        if not _initialized:
+            _initialized = initialize_system()
+
+def _num_chunks() -> int:
+    """Number of chunks in the loaded store"""
+    return 0 if chunk_offsets is None else len(chunk_offsets) - 1
+
+def _chunk_text(idx: int) -> str:
+    """Decode one chunk's text from the shared buffer"""
+    return chunk_buffer[chunk_offsets[idx]:chunk_offsets[idx + 1]].tobytes().decode("utf-8")
+
+def _metadata_row(idx: int) -> Dict:
+    """Read one chunk's metadata row; pages are loaded on first access"""
+    row = metadata[idx]
+    values = {field: row[field].item() for field in metadata.dtype.names}
+    return {
+        field: value.decode("utf-8") if isinstance(value, bytes) else value
+        for field, value in values.items()
+    }
+
+@functools.lru_cache(maxsize=256)
+def _encode_query(query: str) -> bytes:
+    """Encode a query once; repeated questions skip the transformer"""
+    query_embedding = np.ascontiguousarray(query_batcher.encode(query), dtype=np.float32)
+    return query_embedding.tobytes()
+
+def _embed_query(query: str) -> np.ndarray:
+    """Preprocess a query and return its (1, d) embedding"""
+    query = _WHITESPACE.sub(' ', query.strip())
+    return np.frombuffer(_encode_query(query), dtype=np.float32).reshape(1, -1)
+
+def _search_embedding(query: str, query_embedding: np.ndarray) -> np.ndarray:
+    """Bias a query embedding towards KCT for the knowledge base search"""
+    kct_keywords = ["KCT", "Kumaraguru", "College", "Technology"]
+    query_lower = query.lower()
+    
+    if not any(keyword.lower() in query_lower for keyword in kct_keywords):
+        # Steer towards KCT in embedding space instead of encoding a prefixed query
+        query_embedding = query_embedding + _KCT_BIAS_WEIGHT * kct_bias
+        faiss.normalize_L2(query_embedding)
+    
+    return query_embedding
+
+def _cache_key(query: str) -> str:
+    """Normalize a question for exact-match caching"""
+    return _WHITESPACE.sub(' ', query.strip()).lower()
+
+def _lookup_exact(key: str) -> Optional[str]:
+    """Return a cached answer for an identical question"""
+    with _cache_lock:
+        answer = _exact_cache.get(key)
+        if answer is not None:
+            _exact_cache.move_to_end(key)
+        return answer
+
+def _lookup_similar(query_embedding: np.ndarray) -> Optional[str]:
+    """Return a cached answer for a near-duplicate question"""
+    with _cache_lock:
+        if _cache_index is None or _cache_index.ntotal == 0:
+            return None
+        D, I = _cache_index.search(query_embedding, 1)
+        if D[0][0] > _CACHE_THRESHOLD:
+            return _cache_answers[I[0][0]]
+        return None
+
+def _cache_answer(key: str, query_embedding: np.ndarray, answer: str):
+    """Store an answer in both the exact and the similarity cache"""
+    global _cache_index
     
-    if not chunks or not metadata:
+    with _cache_lock:
+        _exact_cache[key] = answer
+        _exact_cache.move_to_end(key)
+        if len(_exact_cache) > _CACHE_SIZE:
+            _exact_cache.popitem(last=False)
+        
+        if _cache_index is None:
+            _cache_index = faiss.IndexFlatIP(query_embedding.shape[1])
+        if len(_cache_answers) >= _CACHE_SIZE:
+            # Evict the oldest tenth at once so the compaction is amortized
+            evict = _CACHE_SIZE // 10
+            _cache_index.remove_ids(np.arange(evict, dtype=np.int64))
+            del _cache_answers[:evict]
+        _cache_index.add(query_embedding)
+        _cache_answers.append(answer)
+
+def enhanced_semantic_search(query: str, k: int = 5, query_embedding: Optional[np.ndarray] = None) -> List[Dict]:
+    """Enhanced semantic search"""
+    num_chunks = _num_chunks()
+    if not num_chunks or metadata is None:
         return []
     
     try:
-        # Preprocess query
-        query = re.sub(r'\s+', ' ', query.strip())
-        
-        kct_keywords = ["KCT", "Kumaraguru", "College", "Technology"]
-        query_lower = query.lower()
-        
-        if not any(keyword.lower() in query_lower for keyword in kct_keywords):
-            query = f"Kumaraguru College of Technology {query}"
-        
-        query_embedding = model.encode([query])
-        
-        search_k = min(k * 2, len(chunks))
-        D, I = index.search(np.array(query_embedding), search_k)
-        
-        results = []
-        for i, (distance, idx) in enumerate(zip(D[0], I[0])):
-            if idx < len(chunks) and idx < len(metadata):
-                chunk_text = chunks[idx]
-                chunk_metadata = metadata[idx] if idx < len(metadata) else {}
-                
-                relevance_score = 1 / (1 + distance)
-                
-                results.append({
-                    "text": chunk_text,
-                    "relevance_score": relevance_score,
-                    "distance": distance,
-                    **chunk_metadata
-                })
-        
-        results.sort(key=lambda x: x["relevance_score"], reverse=True)
-        return results[:k]
+        if query_embedding is None:
+            query_embedding = _embed_query(query)
+        # Only the index search is biased; the answer cache compares raw questions
+        query_embedding = _search_embedding(query, query_embedding)
+        
+        # Take every chunk above the relevance threshold in one call, best k first
+        lims, D, I = index.range_search(query_embedding, _RELEVANCE_THRESHOLD)
+        if lims[1] >= _MIN_RANGE_HITS:
+            order = np.argsort(-D, kind="stable")[:k]
+            D, I = D[order], I[order]
+        else:
+            # Too few chunks clear the threshold; fall back to the plain top k
+            D, I = index.search(query_embedding, min(k, num_chunks))
+            D, I = D[0], I[0]
+        
+        # Inner product of unit vectors is already cosine similarity
+        hits = [
+            (float(similarity), idx)
+            for similarity, idx in zip(D, I)
+            if 0 <= idx < num_chunks
+        ]
+        
+        # Decode text and metadata only for the hits that are returned
+        return [
+            {"text": _chunk_text(idx), "relevance_score": score, **_metadata_row(idx)}
+            for score, idx in hits
+        ]
         
     except Exception as e:
         print(f"Search error: {e}")
@@ -105,7 +348,7 @@ def enhanced_semantic_search(query: str, k: int = 5) -> List[Dict]:
 def create_conversational_prompt(query: str, context_chunks: List[Dict]) -> str:
     """Create a conversational prompt without source formatting"""
     
-    relevant_chunks = [c for c in context_chunks if c.get("relevance_score", 0) > 0.3]
+    relevant_chunks = [c for c in context_chunks if c.get("relevance_score", 0) > _RELEVANCE_THRESHOLD]
     
     if not relevant_chunks:
         relevant_chunks = context_chunks[:3] if context_chunks else []
@@ -113,77 +356,99 @@ def create_conversational_prompt(query: str, context_chunks: List[Dict]) -> str:
     if relevant_chunks:
         context_parts = []
         for i, chunk in enumerate(relevant_chunks[:3]):
-            context_parts.append(f"Information {i+1}: {chunk['text']}")
+            context_parts.append(f"Information {i+1}: {chunk['text'][:_MAX_CHUNK_CHARS]}")
         context = "\n\n".join(context_parts)
     else:
         context = "General information about Kumaraguru College of Technology (KCT), a premier engineering institution in Coimbatore, Tamil Nadu."
     
-    prompt = f"""You are a helpful assistant for Kumaraguru College of Technology (KCT).
-
-QUESTION: {query}
+    prompt = f"""QUESTION: {query}
 
 AVAILABLE INFORMATION:
-{context}
-
-INSTRUCTIONS:
-1. Provide a clear, concise answer using the information available
-2. Be conversational and friendly
-3. Use appropriate emojis to make the response engaging
-4. Break down information into clear sections
-5. Highlight important points
-6. Do NOT include any source citations, references, or links in your response
-7. If you don't have specific information, provide general helpful guidance
-
-FORMAT YOUR RESPONSE:
-[Your natural response here without any sources or citations]"""
+{context}"""
 
     return prompt
 
-def generate_response_without_sources(query: str) -> str:
-    """Generate response without any source formatting"""
+def _stream_without_sources(deltas: Iterator[str]) -> Iterator[str]:
+    """Strip source citations from streamed text one completed line at a time"""
+    buffer = ""
+    in_sources = False
+    
+    def clean_line(line: str) -> str:
+        nonlocal in_sources
+        if in_sources:
+            if line.strip():
+                return ""
+            in_sources = False
+        else:
+            block = _SRC_BLOCK_START.search(line)
+            if block:
+                in_sources = True
+                line = line[:block.start()]
+        for pattern in _SRC_LINE_PATTERNS:
+            line = pattern.sub('', line)
+        return line
+    
+    for delta in deltas:
+        buffer += delta
+        while "\n" in buffer:
+            line, buffer = buffer.split("\n", 1)
+            cleaned = clean_line(line + "\n")
+            if cleaned:
+                yield cleaned
+    
+    if buffer:
+        cleaned = clean_line(buffer)
+        if cleaned:
+            yield cleaned
+
+def generate_response_without_sources(query: str, query_embedding: Optional[np.ndarray] = None) -> Iterator[str]:
+    """Stream a response without any source formatting"""
+    streamed = False
     try:
-        if model is None:
-            initialize_system()
+        if query_embedding is None:
+            query_embedding = _embed_query(query)
         
-        context_chunks = enhanced_semantic_search(query)
+        context_chunks = enhanced_semantic_search(query, query_embedding=query_embedding)
         
         if not context_chunks:
-            return "I couldn't find relevant information about that topic. Please contact KCT directly for more details."
+            yield "I couldn't find relevant information about that topic. Please contact KCT directly for more details."
+            return
         
         prompt = create_conversational_prompt(query, context_chunks)
         
         response = groq_client.chat.completions.create(
             model="llama3-8b-8192",
             messages=[
-                {
-                    "role": "system", 
-                    "content": """You are a helpful assistant for KCT. Follow these rules:
-                    1. Only use information from the provided sources
-                    2. Be conversational and friendly
-                    3. Use appropriate emojis
-                    4. Do NOT include any source citations, references, or links
-                    5. Make your response engaging and informative
-                    6. Break down information into clear sections"""
-                },
+                {"role": "system", "content": _SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.4,
-            max_tokens=1200
+            max_tokens=512,
+            stream=True
         )
         
-        answer = response.choices[0].message.content.strip()
-        
-        # Remove any source-related text that might have been generated
-        answer = re.sub(r'\*\*Sources.*?\*\*.*?(?=\n\n|\Z)', '', answer, flags=re.DOTALL)
-        answer = re.sub(r'Sources Used:.*?(?=\n\n|\Z)', '', answer, flags=re.DOTALL)
-        answer = re.sub(r'\[.*?\]\(.*?\)', '', answer)  # Remove markdown links
-        answer = re.sub(r'Source:.*?\n', '', answer)  # Remove source lines
+        # Tokens go to the user as they arrive, filtered at line boundaries
+        deltas = (chunk.choices[0].delta.content or "" for chunk in response)
+        parts = []
+        for part in _stream_without_sources(deltas):
+            streamed = True
+            parts.append(part)
+            yield part
         
-        return answer.strip()
+        # Remove any source-related text left in the buffered answer before caching it
+        answer = "".join(parts)
+        for pattern in _SRC_BLOCK_PATTERNS + _SRC_LINE_PATTERNS:
+            answer = pattern.sub('', answer)
+        # An empty answer would otherwise be served from the cache, skipping Groq
+        answer = answer.strip()
+        if answer:
+            _cache_answer(_cache_key(query), query_embedding, answer)
         
     except Exception as e:
         print(f"Error generating response: {e}")
-        return """Hello! I'm here to help you learn about Kumaraguru College of Technology (KCT). 🎓
+        if streamed:
+            return
+        yield """Hello! I'm here to help you learn about Kumaraguru College of Technology (KCT). 🎓
 
 KCT is a premier engineering institution in Coimbatore, Tamil Nadu. We offer various undergraduate and postgraduate programs in engineering and technology.
 
@@ -191,21 +456,38 @@ The college has state-of-the-art facilities, experienced faculty members, and an
 
 Please feel free to ask me about programs, admissions, facilities, or any other aspect of KCT!"""
 
-def query_knowledge_base(query: str) -> str:
-    """Main function to query the knowledge base and get a response without sources"""
+def query_knowledge_base(query: str) -> Iterator[str]:
+    """Main function to query the knowledge base and stream a response without sources"""
     try:
-        if model is None or index is None:
-            initialize_system()
+        _ensure_init()
         
-        response = generate_response_without_sources(query)
-        return response
+        # Repeated questions are answered without the model or the LLM
+        key = _cache_key(query)
+        cached = _lookup_exact(key)
+        if cached:
+            yield cached
+            return
+        
+        # Encode once and reuse the embedding for the knowledge base search
+        query_embedding = _embed_query(query)
+        cached = _lookup_similar(query_embedding)
+        if cached:
+            yield cached
+            return
+        
+        yield from generate_response_without_sources(query, query_embedding)
         
     except Exception as e:
         print(f"Error in query_knowledge_base: {e}")
-        return """Hello! I'm here to help you learn about Kumaraguru College of Technology (KCT). 🎓
+        yield """Hello! I'm here to help you learn about Kumaraguru College of Technology (KCT). 🎓
 
 KCT is a premier engineering institution in Coimbatore, Tamil Nadu. We offer various undergraduate and postgraduate programs in engineering and technology.
 
 The college has state-of-the-art facilities, experienced faculty members, and an excellent placement record.
 
 What would you like to know about KCT today?"""
+
+# Load the model and vectorstore at import, i.e. during the first page load,
+# so the first query hits a warm system
+if os.getenv("KCT_EAGER_INIT", "1") == "1":
+    _ensure_init()